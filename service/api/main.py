@@ -1,28 +1,61 @@
 import os
 import io
-import json
+import math
+import asyncio
+import time
+import pickle
+import threading
 
-import pandas as pd
+import orjson
 import yfinance as yf
 import numpy as np
 import matplotlib
-import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 
+from numba import njit
+from cachetools import TTLCache
+from matplotlib.figure import Figure
 from fastapi.templating import Jinja2Templates
 from fastapi import FastAPI, Response, Request, Form, Query
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import (
+    HTMLResponse,
+    ORJSONResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 
+# Pooled figures are constructed via Figure directly and never touch pyplot,
+# but keep the non-interactive backend pinned in case a pyplot import creeps
+# back in
 matplotlib.use("Agg")
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 templates = Jinja2Templates(directory=f"{BASE_DIR}/templates")
 
+# Resolved once: TemplateResponse would re-look the template up by name
+# (loader stat + dict lookup) on every homepage call
+INDEX_TPL = templates.get_template("index.html")
+
 # Default cookie values
 DEFAULT_STATE = {"stocks": ["MSFT"], "period": "1y", "interval": "1d", "scale": "log"}
 
-app = FastAPI()
+# Static whitelist of known symbols, loaded once at startup: unknown tickers
+# are rejected before they cost a wasted yfinance round-trip, and frozenset
+# membership is O(1)
+with open(os.path.join(BASE_DIR, "tickers.txt"), encoding="utf-8") as _fh:
+    VALID_TICKERS = frozenset(_fh.read().split())
+
+# Downloaded stock data is cached in-process and on disk so repeated requests
+# for the same (ticker, period, interval) skip the yfinance round-trip.
+CACHE_TTL = 300  # seconds
+CACHE_DIR = os.path.join(BASE_DIR, ".cache")
+_data_cache = TTLCache(maxsize=512, ttl=CACHE_TTL)
+# TTLCache relinks its expiry list on every get/set and is not thread-safe;
+# the handlers hit it concurrently from asyncio.to_thread workers
+_data_cache_lock = threading.Lock()
+
+app = FastAPI(default_response_class=ORJSONResponse)
 app.mount(
     "/static", StaticFiles(directory=os.path.join(BASE_DIR, "static")), name="static"
 )
@@ -31,22 +64,21 @@ app.mount(
 @app.get("/", response_class=HTMLResponse)
 async def homepage(request: Request):
     state = get_state_from_cookie(request)
-    return templates.TemplateResponse(
-        "index.html",
-        {
-            "request": request,
-            "stocks": state["stocks"],
-            "period": state["period"],
-            "interval": state["interval"],
-            "scale": state["scale"],
-        },
+    return HTMLResponse(
+        INDEX_TPL.render(
+            request=request,
+            stocks=state["stocks"],
+            period=state["period"],
+            interval=state["interval"],
+            scale=state["scale"],
+        )
     )
 
 
-@app.get("/welcome", response_class=HTMLResponse)
-async def root():
-
-    html_content = """
+# Built once at import; the page is fully static, so the same Response
+# instance (already encoded) is returned on every request.
+WELCOME_HTML = HTMLResponse(
+    content="""
     <!DOCTYPE html>
     <html>
     <head>
@@ -77,58 +109,363 @@ async def root():
     </body>
     </html>
     """
+)
+
 
-    return HTMLResponse(content=html_content)
+@app.get("/welcome", response_class=HTMLResponse)
+async def root():
+    return WELCOME_HTML
 
 
 def save_state_in_cookie(response: Response, state: dict):
     """Save state as cookie."""
     response.set_cookie(
         key="stock_state",
-        value=json.dumps(state),
+        value=orjson.dumps(state).decode(),
         httponly=True,
         samesite="lax",
     )
 
 
+def _cache_path(ticker: str, period: str, interval: str):
+    # Keep the filename to a safe character set (tickers come from the URL)
+    safe = "".join(
+        c for c in f"{ticker}_{period}_{interval}" if c.isalnum() or c in "._-^"
+    )
+    return os.path.join(CACHE_DIR, f"{safe}.pkl")
+
+
 def _get_stock_data(ticker: str, period: str, interval: str):
-    # Download stock data
-    data = yf.download(ticker, period=period, interval=interval, progress=False)
-    if data.empty:
-        return None, None, None  # Indicate no data
+    key = (ticker, period, interval)
+    with _data_cache_lock:
+        cached = _data_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Disk cache survives restarts; freshness is checked via the file mtime
+    path = _cache_path(ticker, period, interval)
+    try:
+        if time.time() - os.path.getmtime(path) < CACHE_TTL:
+            with open(path, "rb") as fh:
+                result = pickle.load(fh)
+            with _data_cache_lock:
+                _data_cache[key] = result
+            return result
+    except (OSError, EOFError, pickle.UnpicklingError):
+        # Missing, truncated or otherwise unreadable cache file: refetch
+        pass
+
+    result = _fetch_stock_data(ticker, period, interval)
+    if result[0] is not None:
+        with _data_cache_lock:
+            _data_cache[key] = result
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # Write-then-rename so a process killed mid-dump never leaves a
+            # partial pickle for the next reader
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as fh:
+                pickle.dump(result, fh)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+    return result
 
-    df = data.copy()
-    df.index = pd.to_datetime(df.index)
 
-    # Calculate time difference from the first data point
-    time_diff = df.index - df.index[0]
+def _x_from_index(index, interval: str):
+    # Time difference from the first data point, as int64 nanoseconds on the
+    # raw index buffer — yfinance already returns a DatetimeIndex, so there is
+    # nothing to reparse and no Timedelta objects need constructing. The index
+    # resolution is version-dependent (pandas 3.x hands out datetime64[s]), so
+    # normalize to nanoseconds before viewing; a no-op copy-free cast when the
+    # index is already ns.
+    ns = index.values.astype("datetime64[ns]", copy=False).view(np.int64)
+    ns = ns - ns[0]
 
     # Determine the unit for x based on the interval
     if "m" in interval:
         # Convert to minutes for minute intervals
-        x = time_diff.total_seconds().values / 60.0
+        x = ns / 60_000_000_000
     elif "h" in interval:
         # Convert to hours for hour intervals
-        x = time_diff.total_seconds().values / 3600.0
+        x = ns / 3_600_000_000_000
     elif "d" in interval:
-        # Use days for day intervals
-        x = time_diff.days.values.astype(float)
+        # Use whole days for day intervals
+        x = (ns // 86_400_000_000_000).astype(float)
     elif "wk" in interval:
         # Convert to weeks for week intervals
-        x = (time_diff.days.values / 7.0).astype(float)
+        x = (ns // 86_400_000_000_000) / 7.0
     elif "mo" in interval:
         # Convert to months (approx. 30 days) for month intervals
-        x = (time_diff.days.values / 30.0).astype(float)
+        x = (ns // 86_400_000_000_000) / 30.0
     else:
         # Fallback to total seconds if interval unit is not explicitly handled
         # This ensures x is always non-constant for very short periods/intervals
-        x = time_diff.total_seconds().values.astype(float)
+        x = ns / 1_000_000_000
+
+    return np.ascontiguousarray(x, dtype=np.float64)
+
+
+def _fetch_stock_data(ticker: str, period: str, interval: str):
+    # Download stock data
+    data = yf.download(ticker, period=period, interval=interval, progress=False)
+    if data.empty:
+        return None, None, None  # Indicate no data
+
+    # No copy: the frame is only read (Close column and index) from here on
+    df = data
 
-    y = df["Close"].values
+    # Hand downstream code C-contiguous float64 1-D arrays: yfinance can
+    # return Close as an (n, 1) block-backed column, and the Numba kernel's
+    # cached signature relies on a stable dtype and layout
+    x = _x_from_index(df.index, interval)
+    y = np.ascontiguousarray(df["Close"].to_numpy(dtype=np.float64)).ravel()
 
     return df, x, y
 
 
+def _fetch_batch_data(tickers: tuple, period: str, interval: str):
+    # One HTTP round-trip for the whole watchlist instead of N; cached under
+    # the ticker tuple so repeat dashboard loads skip the network too
+    key = (tickers, period, interval)
+    with _data_cache_lock:
+        cached = _data_cache.get(key)
+    if cached is not None:
+        return cached
+
+    data = yf.download(
+        list(tickers),
+        period=period,
+        interval=interval,
+        group_by="ticker",
+        threads=True,
+        progress=False,
+    )
+    if not data.empty:
+        with _data_cache_lock:
+            _data_cache[key] = data
+    return data
+
+
+@njit(cache=True, fastmath=True)
+def compute_trends(x, y):  # pylint: disable=R0914
+    """Fused trend kernel: least-squares fit on log-price plus the equal-area
+    steady-growth line, in plain loops so no intermediate arrays allocate.
+
+    Returns (trend_ls, avg_growth) in price space. cache=True persists the
+    compiled kernel so workers skip the cold-compile cost after first run.
+    """
+    n = x.size
+
+    # Closed-form linear regression on log(y) from running sums — a degree-1
+    # fit needs no Vandermonde matrix or lstsq/SVD machinery (np.polyfit) —
+    # fused with the trapezoid-rule area (x is non-uniform) so x and y are
+    # swept exactly once; the i=0 terms are peeled off to keep the loop
+    # branch-free for LLVM's autovectorizer
+    log_y0 = math.log(y[0])
+    s_x = x[0]
+    s_y = log_y0
+    s_xx = x[0] * x[0]
+    s_xy = x[0] * log_y0
+    area_actual = 0.0
+    for i in range(1, n):
+        log_y = math.log(y[i])
+        s_x += x[i]
+        s_y += log_y
+        s_xx += x[i] * x[i]
+        s_xy += x[i] * log_y
+        area_actual += 0.5 * (x[i] - x[i - 1]) * (y[i] + y[i - 1])
+    slope_ls = (n * s_xy - s_x * s_y) / (n * s_xx - s_x * s_x)
+    intercept_ls = (s_y - slope_ls * s_x) / n
+
+    # The straight line: y_line = y0 + m * (x - x0)
+    # Its area = y0*(x1 - x0) + m * (x1 - x0)^2 / 2
+    # Solve for slope m such that area_line = area_actual
+    x0 = x[0]
+    y0 = y[0]
+    span = x[n - 1] - x0
+    m = (2.0 * (area_actual - y0 * span)) / (span * span)
+
+    # Fused evaluation of exp(intercept + slope*x) and y0 + m*(x - x0): one
+    # pass over x, no intermediate arrays for the scalar-times-array steps
+    trend_ls = np.empty(n, dtype=np.float64)
+    avg_growth = np.empty(n, dtype=np.float64)
+    for i in range(n):
+        trend_ls[i] = math.exp(intercept_ls + slope_ls * x[i])
+        avg_growth[i] = y0 + m * (x[i] - x0)
+
+    return trend_ls, avg_growth
+
+
+# Figure construction tears down and rebuilds a 2400x1200 RGBA canvas (~11 MB)
+# per request. Each thread instead keeps one figure alive and reuses it;
+# thread-locality is what keeps this safe, since matplotlib figures are not
+# shareable across threads. Grid, labels, tick formatters and
+# the three line artists are created once and only fed new data per request —
+# matplotlib's animation-style reuse idiom.
+_fig_pool = threading.local()
+
+
+def _get_figure():
+    if not hasattr(_fig_pool, "fig"):
+        # Figure (not plt.subplots) keeps the pooled figure out of pyplot's
+        # global manager: one figure per executor thread would blow past
+        # max_open_warning and pin every figure in memory for good
+        fig = Figure(figsize=(20, 12))
+        ax = fig.add_subplot()
+        # Fixed margins so savefig needs no bbox_inches="tight", which
+        # renders the whole figure twice (once to measure, once for real)
+        fig.subplots_adjust(left=0.05, right=0.98, top=0.95, bottom=0.07)
+        ax.set_xlabel("Date")
+        ax.grid(True, which="major", ls="--", alpha=0.7)
+        (line_price,) = ax.plot([], [], color="red")
+        (line_avg,) = ax.plot(
+            [], [], linestyle="--", color="green", label="Average Growth"
+        )
+        (line_trend,) = ax.plot([], [], linestyle="--", color="blue", label="Trend")
+        _fig_pool.fig = fig
+        _fig_pool.ax = ax
+        _fig_pool.lines = (line_price, line_avg, line_trend)
+        _fig_pool.fmt_major = mticker.ScalarFormatter()
+        _fig_pool.fmt_null = mticker.NullFormatter()
+    return _fig_pool.fig, _fig_pool.ax, _fig_pool.lines
+
+
+def _get_batch_figure():
+    # Companion pooled figure for multi-ticker renders: the line count varies
+    # per request, so this one is cleared rather than keeping persistent artists
+    if not hasattr(_fig_pool, "batch_fig"):
+        fig = Figure(figsize=(20, 12))
+        ax = fig.add_subplot()
+        fig.subplots_adjust(left=0.05, right=0.98, top=0.95, bottom=0.07)
+        _fig_pool.batch_fig = fig
+        _fig_pool.batch_ax = ax
+        # Own formatter instances: a Formatter binds to the axis it is
+        # attached to, so the single-trend figure's pair cannot be shared
+        _fig_pool.batch_fmt_major = mticker.ScalarFormatter()
+        _fig_pool.batch_fmt_null = mticker.NullFormatter()
+    _fig_pool.batch_ax.clear()
+    return _fig_pool.batch_fig, _fig_pool.batch_ax
+
+
+def _svg_response(buf: io.BytesIO) -> StreamingResponse:
+    # Stream straight from the render buffer instead of copying it out with
+    # getvalue(), which doubled peak memory of the response path; the
+    # Cache-Control lifetime mirrors the server-side data TTL
+    return StreamingResponse(
+        buf,
+        media_type="image/svg+xml",
+        headers={
+            "Content-Length": str(buf.getbuffer().nbytes),
+            "Cache-Control": f"public, max-age={CACHE_TTL}",
+        },
+    )
+
+
+def _render_plot(df, x, y, scale: str, ticker: str) -> io.BytesIO:
+    # Least-squares fit on log-price and equal-area growth line, in one
+    # kernel. Run here rather than in the handler so the first request's
+    # Numba compile also lands on the worker thread, not the event loop.
+    trend_ls, avg_growth = compute_trends(x, y)
+
+    fig, ax, (line_price, line_avg, line_trend) = _get_figure()
+
+    # The pooled lines were created with empty numeric data, so ax.plot never
+    # registered matplotlib's date converter; install it (and with it the date
+    # locator/formatter) before pushing datetimes through set_data, or the
+    # x ticks render as raw ordinals
+    ax.xaxis.update_units(df.index)
+
+    # Downcast at the plot boundary only — halves the bytes moved through
+    # matplotlib's transform pipeline (the fit stays in float64)
+    line_price.set_data(df.index, y.astype(np.float32, copy=False))
+    line_price.set_label(f"{ticker}")
+    line_avg.set_data(df.index, avg_growth.astype(np.float32, copy=False))
+    line_trend.set_data(df.index, trend_ls.astype(np.float32, copy=False))
+    ax.relim()
+    ax.autoscale_view()
+
+    # Apply y-axis scale
+    if scale == "log":
+        ax.set_yscale("log", base=2)
+        ax.set_ylabel("Price (log scale)")
+    else:
+        ax.set_yscale("linear")
+        ax.set_ylabel("Price")
+
+    # Format y-axis ticks to show actual values; set_yscale installs fresh
+    # formatters, so reattach the pooled ones rather than constructing anew
+    ax.yaxis.set_major_formatter(_fig_pool.fmt_major)
+    ax.yaxis.set_minor_formatter(_fig_pool.fmt_null)
+
+    ax.set_title(f"{ticker} Stock Price with Trend")
+    ax.legend()
+
+    # Save to memory; the pooled figure is reused, not closed. SVG skips Agg
+    # rasterization entirely and is a few KB instead of ~200 KB. The buffer is
+    # fresh per render: the response streams from it after the handler
+    # returns, so a pooled one could be truncated mid-drain by this thread's
+    # next request.
+    buf = io.BytesIO()
+    fig.savefig(buf, format="svg")
+    buf.seek(0)
+    return buf
+
+
+def _render_batch_plot(data, tickers: tuple, interval: str, scale: str) -> io.BytesIO:
+    fig, ax = _get_batch_figure()
+
+    for ticker in tickers:
+        # With group_by="ticker" the columns are a (ticker, field) MultiIndex;
+        # a single-symbol download may come back flat
+        try:
+            if data.columns.nlevels > 1:
+                series = data[ticker]["Close"]
+            else:
+                series = data["Close"]
+        except KeyError:
+            continue
+        series = series.dropna()
+        if len(series) < 2:
+            continue
+
+        y = np.ascontiguousarray(series.to_numpy(dtype=np.float64)).ravel()
+        (line,) = ax.plot(series.index, y.astype(np.float32, copy=False), label=ticker)
+
+        # Overlay each symbol's trend in its line colour when computable
+        x = _x_from_index(series.index, interval)
+        if np.std(x) != 0 and not (np.any(~np.isfinite(y)) or np.any(y <= 0)):
+            trend_ls, _ = compute_trends(x, y)
+            ax.plot(
+                series.index,
+                trend_ls.astype(np.float32, copy=False),
+                linestyle="--",
+                alpha=0.6,
+                color=line.get_color(),
+            )
+
+    # Apply y-axis scale
+    if scale == "log":
+        ax.set_yscale("log", base=2)
+        ax.set_ylabel("Price (log scale)")
+    else:
+        ax.set_yscale("linear")
+        ax.set_ylabel("Price")
+
+    ax.yaxis.set_major_formatter(_fig_pool.batch_fmt_major)
+    ax.yaxis.set_minor_formatter(_fig_pool.batch_fmt_null)
+
+    ax.set_title("Stock Prices with Trends")
+    ax.set_xlabel("Date")
+    ax.legend()
+    ax.grid(True, which="major", ls="--", alpha=0.7)
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="svg")
+    buf.seek(0)
+    return buf
+
+
 INTERVAL_DESCR = """
 Data interval options:
 <ul>
@@ -156,22 +493,20 @@ async def get_trend(  # pylint: disable=R0914
     interval: str = Query("1d", description=INTERVAL_DESCR),
     scale: str = "linear",  # <-- now "linear" or "log"
 ):
-    # Download stock data
-    df, x, y = _get_stock_data(ticker, period, interval)
+    # Download stock data off the event loop: yfinance blocks on the network
+    # and would otherwise serialize every request on this worker
+    df, x, y = await asyncio.to_thread(_get_stock_data, ticker, period, interval)
     if df is None:
         return Response(content=b"No data available", media_type="text/plain")
 
-    # Least-squares fit on log-price
-    y_log = np.log(y)
-
-    # Debugging: Check for problematic data before polyfit
+    # Debugging: Check for problematic data before fitting
     if len(x) < 2:
-        print(f"Debug: Insufficient data points for polyfit. len(x)={len(x)}")
+        print(f"Debug: Insufficient data points for trend fit. len(x)={len(x)}")
         return Response(
             content=b"Insufficient data for trend calculation", media_type="text/plain"
         )
-    if np.any(np.isnan(y_log)) or np.any(np.isinf(y_log)):
-        print(f"Debug: NaN or Inf values in y_log. y_log={y_log}")
+    if np.any(~np.isfinite(y)) or np.any(y <= 0):
+        print(f"Debug: non-positive or non-finite prices. y={y}")
         return Response(
             content=b"Invalid data for trend calculation (NaN/Inf in log prices)",
             media_type="text/plain",
@@ -183,64 +518,36 @@ async def get_trend(  # pylint: disable=R0914
             media_type="text/plain",
         )
 
-    slope_ls, intercept_ls = np.polyfit(x, y_log, 1)
-    trend_ls = np.exp(intercept_ls + slope_ls * x)  # back to price space
+    # The trend fit and rendering are CPU-bound; run both on the threadpool
+    buf = await asyncio.to_thread(_render_plot, df, x, y, scale, ticker)
+    return _svg_response(buf)
 
-    # steady growth rate
-    ## fix shape
-    y = df["Close"].to_numpy(dtype=float).reshape(-1)
 
-    x0, x1 = x[0], x[-1]
-    y0 = y[0]
-
-    # Total area under actual curve
-    area_actual = np.trapezoid(y, x)
-
-    # The straight line: y_line = y0 + m * (x - x0)
-    # Its area = ∫(y0 + m*(x - x0)) dx from x0 to x1
-    #          = y0*(x1 - x0) + m * (x1 - x0)^2 / 2
-    # Solve for slope m such that area_line = area_actual
-    m = (2 * (area_actual - y0 * (x1 - x0))) / ((x1 - x0) ** 2)
-
-    avg_growth = y0 + m * (x - x0)
-
-    fig, ax = plt.subplots(figsize=(20, 12))
-    ax.plot(df.index, y, label=f"{ticker}", color="red")
-    ax.plot(df.index, avg_growth, linestyle="--", color="green", label="Average Growth")
-    ax.plot(df.index, trend_ls, linestyle="--", color="blue", label="Trend")
-
-    # Apply y-axis scale
-    if scale == "log":
-        ax.set_yscale("log", base=2)
-        ax.set_ylabel("Price (log scale)")
-    else:
-        ax.set_yscale("linear")
-        ax.set_ylabel("Price")
-
-    # Format y-axis ticks to show actual values
-    ax.yaxis.set_major_formatter(mticker.ScalarFormatter())
-    ax.yaxis.set_minor_formatter(mticker.NullFormatter())
-
-    ax.set_title(f"{ticker} Stock Price with Trend")
-    ax.set_xlabel("Date")
-    ax.legend()
-    ax.grid(True, which="major", ls="--", alpha=0.7)
+@app.get("/trend")
+async def get_trends(
+    tickers: str = Query(..., description="Comma-separated list of tickers"),
+    period: str = "7d",
+    interval: str = Query("1d", description=INTERVAL_DESCR),
+    scale: str = "linear",
+):
+    symbols = tuple(t.strip().upper() for t in tickers.split(",") if t.strip())
+    if not symbols:
+        return Response(content=b"No tickers given", media_type="text/plain")
 
-    # Save to memory
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight")
-    plt.close(fig)
-    buf.seek(0)
+    data = await asyncio.to_thread(_fetch_batch_data, symbols, period, interval)
+    if data.empty:
+        return Response(content=b"No data available", media_type="text/plain")
 
-    return Response(content=buf.getvalue(), media_type="image/png")
+    buf = await asyncio.to_thread(_render_batch_plot, data, symbols, interval, scale)
+    return _svg_response(buf)
 
 
 def get_state_from_cookie(request: Request):
     cookie = request.cookies.get("stock_state")
     if cookie:
         try:
-            return json.loads(cookie)
-        except json.JSONDecodeError:
+            return orjson.loads(cookie)
+        except ValueError:  # orjson.JSONDecodeError subclasses ValueError
             pass
     # defaults
     return DEFAULT_STATE.copy()
@@ -250,7 +557,10 @@ def get_state_from_cookie(request: Request):
 async def add_stock(request: Request, ticker: str = Form(...)):
     state = get_state_from_cookie(request)
     ticker = ticker.upper()
-    if ticker not in state["stocks"]:
+    # The cookie keeps a list for JSON compatibility; dedup via a set so the
+    # membership check stays O(1) however long the watchlist grows
+    stocks = set(state["stocks"])
+    if ticker in VALID_TICKERS and ticker not in stocks:
         state["stocks"].append(ticker)
 
     response = RedirectResponse(url="/", status_code=303)
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "service", "api"))
+
+import main  # pylint: disable=wrong-import-position
+
+
+def test_x_from_index_is_unit_agnostic():
+    # pylint: disable=protected-access
+    # pandas 3.x / yfinance can hand back a second-resolution index; the x
+    # offsets must not depend on the index resolution
+    days = pd.date_range("2025-01-01", periods=5, freq="D")
+    x_ns = main._x_from_index(days.as_unit("ns"), "1d")
+    x_s = main._x_from_index(days.as_unit("s"), "1d")
+
+    np.testing.assert_array_equal(x_ns, np.arange(5, dtype=np.float64))
+    np.testing.assert_array_equal(x_s, x_ns)